@@ -1,26 +1,34 @@
 
-import os
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+import os, time
+_t0 = time.perf_counter()
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Header, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from typing import Optional, List, Literal
-from .models import init_db, SessionLocal, Client, Document, Result, Normativa
-from .schemas import ClientIn, ClientOut, DocumentOut, ResultOut, ProcessRequest
-from .services.ocr_parser import extract_fields_from_file
+from .models import init_db, engine, SessionLocal, Client, Document, Result, Normativa
+from .schemas import ClientIn, ClientOut, ClientImportOut, DocumentOut, ResultOut, ProcessRequest
 from .services.accounting import generate_entries_and_statements
-from .services.excel_export import export_all_to_excels, export_single_to_excel
-from .services.afip_export import export_ddjj_iva, export_ddjj_ganancias, export_ddjj_iibb, export_ddjj_bbpp
-from .services.validate import validate_cuit
-from .services.zip_export import make_zip
-from sqlalchemy import select
+from .services.validate import validate_cuit, validate_cuits, flag_invalid_cuits, normalize_cuit
+from .services.preview import section_rows, query_rows, paginate, make_etag
+from .services.storage import LocalStorage
+from .services.startup import profiles_from_env, warmup, timed_import, record_import, IMPORT_TIMES
+from sqlalchemy import select, delete, func
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
-import uuid, pathlib, aiofiles
+import pathlib, shutil, tempfile
+from functools import lru_cache
+from datetime import datetime
 
+# Los módulos pesados (OCR, exportadores) se importan dentro de cada ruta y NumPy
+# dentro de validate_cuits;
+# con WARMUP=ocr,export,validate se precargan en el arranque.
+record_import(__name__, _t0)  # arranque en frío de main (FastAPI, SQLAlchemy, modelos)
 load_dotenv()
 STORAGE_DIR = os.getenv("STORAGE_DIR", "./data/storage")
-os.makedirs(STORAGE_DIR, exist_ok=True)
+storage = LocalStorage(STORAGE_DIR)
 
 app = FastAPI(title="Conta API", version="0.1.0")
 origins = os.getenv("ALLOW_ORIGINS", "http://localhost:5173").split(",")
@@ -30,11 +38,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 @app.on_event("startup")
 def _startup():
     init_db()
+    profiles = profiles_from_env()
+    if profiles:
+        warmup(profiles)
+
+@app.get("/admin/startup")
+def startup_profile():
+    """Tiempos de importación (ms) de los módulos pesados cargados hasta ahora."""
+    return {"warmup": profiles_from_env(), "import_ms": IMPORT_TIMES}
+
+def _service(name: str):
+    """Importa app.services.<name> bajo demanda, registrando el tiempo en /admin/startup."""
+    return timed_import(f"{__package__}.services.{name}")
 
 # --- Clientes CRUD ---
 @app.post("/clientes", response_model=ClientOut)
@@ -43,11 +64,51 @@ def create_client(payload: ClientIn):
         raise HTTPException(400, "CUIT inválido (dígito verificador).")
     with SessionLocal() as db:
         c = Client(name=payload.nombre.strip(),
-                   cuit=payload.cuit.strip(),
+                   cuit=normalize_cuit(payload.cuit),
                    condicion_fiscal=payload.condicion_fiscal)
         db.add(c); db.commit(); db.refresh(c)
         return ClientOut(id=c.id, nombre=c.name, cuit=c.cuit, condicion_fiscal=c.condicion_fiscal)
 
+@app.post("/clientes/import", response_model=ClientImportOut)
+def import_clients(payload: List[ClientIn], on_conflict: Literal["skip","update"] = "skip"):
+    """
+    Alta masiva de clientes en una sola transacción.
+    Valida todos los CUIT en lote; los inválidos se informan y no se insertan.
+    Los CUIT se normalizan a dígitos, así "20-12345678-6" y "20123456786" son el mismo cliente.
+    Si el CUIT ya existe: `skip` lo omite, `update` actualiza nombre y condición fiscal.
+    """
+    valid = validate_cuits(p.cuit for p in payload)
+    invalidos = [{"fila": i, "cuit": p.cuit} for i, (p, v) in enumerate(zip(payload, valid)) if not v]
+    rows = {}
+    for p, v in zip(payload, valid):
+        if v:  # si el CUIT se repite en el lote, gana la última fila
+            cuit = normalize_cuit(p.cuit)
+            rows[cuit] = {"name": p.nombre.strip(), "cuit": cuit, "condicion_fiscal": p.condicion_fiscal}
+    repetidos = int(valid.sum()) - len(rows)
+
+    with SessionLocal() as db:
+        cuits = list(rows)
+        existentes = set()
+        for i in range(0, len(cuits), 500):
+            existentes.update(db.execute(select(Client.cuit).where(Client.cuit.in_(cuits[i:i+500]))).scalars())
+        if rows:
+            if engine.dialect.name == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(Client)
+            if on_conflict == "update":
+                stmt = stmt.on_conflict_do_update(index_elements=[Client.cuit],
+                                                  set_={"name": stmt.excluded.name, "condicion_fiscal": stmt.excluded.condicion_fiscal})
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=[Client.cuit])
+            db.execute(stmt, list(rows.values()))
+        db.commit()
+
+    actualizados = len(existentes) if on_conflict == "update" else 0
+    return ClientImportOut(insertados=len(rows) - len(existentes), actualizados=actualizados,
+                           omitidos=repetidos + len(existentes) - actualizados, invalidos=invalidos)
+
 @app.get("/clientes", response_model=List[ClientOut])
 def list_clients():
     with SessionLocal() as db:
@@ -59,7 +120,19 @@ def delete_client(client_id: int):
     with SessionLocal() as db:
         c = db.get(Client, client_id)
         if not c: raise HTTPException(404, "Cliente no encontrado")
+        paths = db.execute(select(Document.path).where(Document.client_id==client_id).distinct()).scalars().all()
+        db.execute(delete(Document).where(Document.client_id==client_id))
+        db.execute(delete(Result).where(Result.client_id==client_id))
         db.delete(c); db.commit()
+        # archivos huérfanos: ningún otro documento apunta al mismo contenido.
+        # Bajo el lock del storage para no competir con una subida del mismo archivo.
+        with storage.lock():
+            usados = set()
+            for i in range(0, len(paths), 500):
+                usados.update(db.execute(select(Document.path).where(Document.path.in_(paths[i:i+500])).distinct()).scalars())
+            for p in paths:
+                if p not in usados:
+                    storage.delete(p)
         return {"ok": True}
 
 # --- Upload documentos ---
@@ -69,21 +142,35 @@ async def upload_document(cliente_id: int = Form(...), tipo: str = Form(...), fi
         c = db.get(Client, cliente_id)
         if not c: raise HTTPException(404, "Cliente no encontrado")
     ext = pathlib.Path(file.filename).suffix.lower()
-    fname = f"{uuid.uuid4().hex}{ext}"
-    dest = os.path.join(STORAGE_DIR, fname)
-    async with aiofiles.open(dest, "wb") as f:
-        while True:
-            chunk = await file.read(1024*1024)
-            if not chunk: break
-            await f.write(chunk)
-    with SessionLocal() as db:
-        d = Document(client_id=cliente_id, tipo=tipo, path=dest)
+    staged = await storage.stage(file)
+    return await run_in_threadpool(_commit_upload, staged, ext, cliente_id, tipo)
+
+def _commit_upload(staged, ext: str, cliente_id: int, tipo: str) -> DocumentOut:
+    # commit del archivo + alta del Document bajo el mismo lock que usa delete_client;
+    # fuera del event loop porque el lock y la DB son bloqueantes
+    with storage.lock(), SessionLocal() as db:
+        key = storage.commit(staged, ext)
+        d = Document(client_id=cliente_id, tipo=tipo, path=key)
         db.add(d); db.commit(); db.refresh(d)
         return DocumentOut(id=d.id, cliente_id=d.client_id, tipo=d.tipo, ruta_archivo=d.path)
 
+@app.get("/documentos/{documento_id}/miniatura")
+def document_thumbnail(documento_id: int, size: int = 256):
+    with SessionLocal() as db:
+        d = db.get(Document, documento_id)
+        if not d: raise HTTPException(404, "Documento no encontrado")
+    thumb = storage.thumbnail(d.path, size)
+    if not thumb: raise HTTPException(415, "Sin vista previa para este tipo de archivo")
+    return Response(thumb, media_type="image/jpeg", headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
 # --- Procesar documentos (OCR + contabilidad) ---
 @app.post("/procesar", response_model=ResultOut)
-def procesar(payload: ProcessRequest):
+def procesar(payload: ProcessRequest, incluir_contenido: bool = True):
+    """
+    OCR + motor contable. Con `incluir_contenido=false` la respuesta trae sólo
+    `_validaciones`; las secciones se consultan paginadas con /resultados/{id}/preview.
+    """
+    extract_fields_from_file = _service("ocr_parser").extract_fields_from_file
     with SessionLocal() as db:
         c = db.get(Client, payload.cliente_id)
         if not c: raise HTTPException(404, "Cliente no encontrado")
@@ -92,13 +179,19 @@ def procesar(payload: ProcessRequest):
         extracted = []
         for d in docs:
             try:
-                extracted.append(extract_fields_from_file(d.path, d.tipo))
+                extracted.append(extract_fields_from_file(storage.local_path(d.path), d.tipo))
             except Exception as e:
                 extracted.append({"_error": str(e), "path": d.path, "tipo": d.tipo})
+        cuits_invalidos = flag_invalid_cuits(extracted)
+        for h in cuits_invalidos:
+            h["documento_id"] = docs[h.pop("documento")].id
         acc = generate_entries_and_statements(extracted, c.condicion_fiscal)
-        r = Result(client_id=c.id, tipo="paquete", contenido_json=acc)
+        acc["_validaciones"]["cuits_invalidos"] = cuits_invalidos
+        r = Result(client_id=c.id, tipo="paquete", contenido_json=acc,
+                   fecha_generacion=datetime.now().isoformat(timespec="microseconds"))
         db.add(r); db.commit(); db.refresh(r)
-        return ResultOut(id=r.id, cliente_id=c.id, tipo=r.tipo, contenido_json=r.contenido_json)
+        contenido = r.contenido_json if incluir_contenido else {"_validaciones": acc["_validaciones"]}
+        return ResultOut(id=r.id, cliente_id=c.id, tipo=r.tipo, contenido_json=contenido)
 
 @app.get("/resultados/{cliente_id}", response_model=List[ResultOut])
 def resultados(cliente_id: int):
@@ -106,6 +199,50 @@ def resultados(cliente_id: int):
         rows = db.execute(select(Result).where(Result.client_id==cliente_id)).scalars().all()
         return [ResultOut(id=r.id, cliente_id=r.client_id, tipo=r.tipo, contenido_json=r.contenido_json) for r in rows]
 
+@app.get("/resultados/{cliente_id}/preview/{seccion}", response_class=ORJSONResponse)
+def preview_seccion(cliente_id: int,
+                    seccion: Literal["asientos","mayor","balance_ss","libro_iva_compras","libro_iva_ventas"],
+                    limit: int = 100, cursor: Optional[str] = None,
+                    sort: Optional[str] = None, order: Literal["asc","desc"] = "asc",
+                    cuenta: Optional[str] = None, desde: Optional[str] = None,
+                    hasta: Optional[str] = None, cuit: Optional[str] = None,
+                    if_none_match: Optional[str] = Header(None)):
+    """
+    Previsualización paginada de una sección del último resultado del cliente.
+    Filtros: cuenta, desde/hasta (dd/mm/aaaa), cuit. Orden por cualquier columna.
+    Soporta ETag / If-None-Match (304 si el resultado y los parámetros no cambiaron).
+    """
+    limit = max(1, min(limit, 1000))
+    with SessionLocal() as db:
+        last = db.execute(select(Result.id, Result.fecha_generacion).where(Result.client_id==cliente_id)
+                          .order_by(Result.id.desc()).limit(1)).first()
+        if last is None: raise HTTPException(404, "Sin resultados")
+        result_id, generado = last
+        params = {"seccion": seccion, "limit": limit, "cursor": cursor, "sort": sort, "order": order,
+                  "cuenta": cuenta, "desde": desde, "hasta": hasta, "cuit": cuit}
+        etag = make_etag(result_id, generado, params)
+        if if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+    try:
+        rows = _preview_rows(result_id, generado, seccion, cuenta, desde, hasta, cuit, sort, order)
+        page = paginate(rows, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    page["resultado_id"] = result_id
+    return ORJSONResponse(page, headers={"ETag": etag})
+
+# Cache de previsualización: el resultado es inmutable y (id, fecha_generacion) lo
+# identifica, así las páginas siguientes no vuelven a decodificar, filtrar ni ordenar.
+@lru_cache(maxsize=2)
+def _paquete(result_id: int, generado: str) -> dict:
+    with SessionLocal() as db:
+        return db.get(Result, result_id).contenido_json
+
+@lru_cache(maxsize=16)
+def _preview_rows(result_id, generado, seccion, cuenta, desde, hasta, cuit, sort, order) -> List[dict]:
+    return query_rows(section_rows(_paquete(result_id, generado), seccion), cuenta=cuenta, desde=desde,
+                      hasta=hasta, cuit=cuit, sort=sort, order=order)
+
 # --- Exportaciones ---
 @app.get("/exportar/{tipo}")
 def exportar(tipo: Literal["asientos","mayor","balance_ss","ee_pp","ee_rr","ee_pn","flujo","iva","ganancias","iibb","bbpp","libro_iva","sueldos"], cliente_id: int):
@@ -113,6 +250,7 @@ def exportar(tipo: Literal["asientos","mayor","balance_ss","ee_pp","ee_rr","ee_p
         rows = db.execute(select(Result).where(Result.client_id==cliente_id)).scalars().all()
         if not rows: raise HTTPException(404, "Sin resultados para exportar")
         pkg = rows[-1].contenido_json
+    export_single_to_excel = _service("excel_export").export_single_to_excel
     path = export_single_to_excel(pkg, tipo, out_dir="./exports")
     return FileResponse(path, filename=os.path.basename(path), media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
@@ -122,6 +260,8 @@ def exportar_zip(cliente_id: int):
         rows = db.execute(select(Result).where(Result.client_id==cliente_id)).scalars().all()
         if not rows: raise HTTPException(404, "Sin resultados")
         pkg = rows[-1].contenido_json
+    export_all_to_excels = _service("excel_export").export_all_to_excels
+    make_zip = _service("zip_export").make_zip
     files = export_all_to_excels(pkg, out_dir="./exports")
     zip_path = make_zip(files, out_path="./exports/conta_export.zip")
     return FileResponse(zip_path, filename="conta_export.zip", media_type="application/zip")
@@ -150,24 +290,65 @@ def upsert_normativa(n: NormativaIn):
 def exportar_afip(tipo: str, cliente_id: int):
     """
     Genera archivos TXT con estructura AFIP para DDJJ y libros.
+    Un TXT por período; si hay más de uno (o es libro_iva) se entregan en ZIP.
     """
-    from sqlalchemy import select
-    from fastapi.responses import FileResponse
+    afip = _service("afip_export")
+    export_paquete, TIPOS_BULK = afip.export_paquete, afip.TIPOS_BULK
+    make_zip = _service("zip_export").make_zip
+    if tipo not in TIPOS_BULK:
+        raise HTTPException(400, "Tipo no reconocido")
     with SessionLocal() as db:
-        rows = db.execute(select(Result).where(Result.client_id==cliente_id)).scalars().all()
-        if not rows:
+        row = db.execute(select(Client.cuit, Result.contenido_json).join(Result, Result.client_id==Client.id)
+                         .where(Client.id==cliente_id).order_by(Result.id.desc()).limit(1)).first()
+        if not row:
             raise HTTPException(404, "Sin resultados para exportar")
-        pkg = rows[-1].contenido_json
+        cuit, pkg = row
 
-    if tipo == "iva":
-        path = export_ddjj_iva(pkg["ddjj_iva"])
-    elif tipo == "ganancias":
-        path = export_ddjj_ganancias(pkg["ddjj_ganancias"])
-    elif tipo == "iibb":
-        path = export_ddjj_iibb(pkg["ddjj_iibb"])
-    elif tipo == "bbpp":
-        path = export_ddjj_bbpp(pkg["ddjj_bbpp"])
-    else:
+    out_dir = _export_tmp_dir()
+    cleanup = BackgroundTask(shutil.rmtree, out_dir, ignore_errors=True)
+    files = export_paquete(pkg, tipo, out_dir)
+    if not files:
+        shutil.rmtree(out_dir, ignore_errors=True)
+        raise HTTPException(404, "Sin datos para exportar")
+    if len(files) == 1 and tipo != "libro_iva":
+        return FileResponse(files[0], filename=os.path.basename(files[0]), media_type="text/plain", background=cleanup)
+    zip_path = make_zip(files, out_path=os.path.join(out_dir, f"afip_{tipo}_{cuit}.zip"))
+    return FileResponse(zip_path, filename=os.path.basename(zip_path), media_type="application/zip", background=cleanup)
+
+@app.get("/exportar_afip_bulk")
+def exportar_afip_bulk(tipos: Optional[str] = None, periodos: Optional[str] = None, cliente_ids: Optional[str] = None):
+    """
+    Exportación masiva AFIP: un ZIP con una carpeta por CUIT y los TXT de cada período
+    del último resultado de cada cliente.
+    Parámetros separados por coma: tipos (iva,ganancias,iibb,bbpp,libro_iva),
+    periodos (AAAAMM o AAAA) y cliente_ids. Sin filtros exporta todo.
+    """
+    afip = _service("afip_export")
+    export_bulk, TIPOS_BULK = afip.export_bulk, afip.TIPOS_BULK
+    tipos_l = [t.strip() for t in tipos.split(",")] if tipos else TIPOS_BULK
+    if any(t not in TIPOS_BULK for t in tipos_l):
         raise HTTPException(400, "Tipo no reconocido")
+    periodos_l = [p.strip() for p in periodos.split(",")] if periodos else None
+    try:
+        ids = [int(i) for i in cliente_ids.split(",")] if cliente_ids else None
+    except ValueError:
+        raise HTTPException(400, "cliente_ids inválido")
+
+    ultimo = select(func.max(Result.id).label("id")).group_by(Result.client_id).subquery()
+    stmt = (select(Client.cuit, Result.contenido_json)
+            .join(Result, Result.client_id==Client.id)
+            .join(ultimo, ultimo.c.id==Result.id))
+    if ids:
+        stmt = stmt.where(Client.id.in_(ids))
+    stmt = stmt.order_by(Client.id).execution_options(yield_per=50)
+    out_dir = _export_tmp_dir()
+    with SessionLocal() as db:
+        zip_path = export_bulk((tuple(row) for row in db.execute(stmt)), out_path=os.path.join(out_dir, "afip_bulk.zip"),
+                               tipos=tipos_l, periodos=periodos_l)
+    return FileResponse(zip_path, filename="afip_bulk.zip", media_type="application/zip",
+                        background=BackgroundTask(shutil.rmtree, out_dir, ignore_errors=True))
 
-    return FileResponse(path, filename=os.path.basename(path), media_type="text/plain")
+def _export_tmp_dir() -> str:
+    """Carpeta propia de cada request (se borra al terminar de enviar la respuesta)."""
+    os.makedirs("./exports", exist_ok=True)
+    return tempfile.mkdtemp(prefix="afip_", dir="./exports")
@@ -10,6 +10,12 @@ class ClientIn(BaseModel):
 class ClientOut(ClientIn):
     id: int
 
+class ClientImportOut(BaseModel):
+    insertados: int
+    actualizados: int
+    omitidos: int  # ya existían (on_conflict="skip") o repetidos en el lote
+    invalidos: List[Dict[str, Any]]
+
 class DocumentOut(BaseModel):
     id: int
     cliente_id: int
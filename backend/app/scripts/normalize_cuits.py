@@ -0,0 +1,46 @@
+"""
+Migración única: CUIT guardados con guiones/puntos (altas anteriores) -> sólo dígitos.
+
+    cd backend && python -m app.scripts.normalize_cuits [--dry-run]
+
+Si dos clientes quedan con el mismo CUIT normalizado no se modifica nada:
+se listan los conflictos y sale con código 1 para resolverlos a mano
+(fusionar o borrar el duplicado) antes de volver a correrla.
+"""
+import logging, sys
+from sqlalchemy import select
+from ..models import SessionLocal, Client
+from ..services.validate import normalize_cuit
+
+logger = logging.getLogger("normalize_cuits")
+
+
+def main(dry_run: bool = False) -> int:
+    with SessionLocal() as db:
+        clients = db.execute(select(Client)).scalars().all()
+        por_cuit = {}
+        for c in clients:
+            por_cuit.setdefault(normalize_cuit(c.cuit), []).append(c)
+
+        conflictos = {cuit: cs for cuit, cs in por_cuit.items() if len(cs) > 1}
+        for cuit, cs in conflictos.items():
+            logger.error("CUIT %s repetido: %s", cuit, ", ".join(f"id={c.id} ({c.cuit!r}, {c.name})" for c in cs))
+        if conflictos:
+            logger.error("%d conflictos; no se modificó ningún cliente.", len(conflictos))
+            return 1
+
+        cambios = [(c, cuit) for cuit, cs in por_cuit.items() for c in cs if c.cuit != cuit]
+        for c, cuit in cambios:
+            logger.info("id=%s: %r -> %s", c.id, c.cuit, cuit)
+            c.cuit = cuit
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+        logger.info("%d clientes normalizados%s.", len(cambios), " (dry-run)" if dry_run else "")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    sys.exit(main(dry_run="--dry-run" in sys.argv))
@@ -30,6 +30,7 @@ def generate_entries_and_statements(extracted_docs: List[Dict], condicion_fiscal
         cuit_emisor = doc.get("cuit_emisor")
         cuit_receptor = doc.get("cuit_receptor")
         operacion = doc.get("operacion") or "COMPRA"
+        comprobante = doc.get("nro_comprobante")
 
         # ============= ASIENTOS =============
         if operacion == "COMPRA":
@@ -43,6 +44,7 @@ def generate_entries_and_statements(extracted_docs: List[Dict], condicion_fiscal
                 "Fecha": fecha,
                 "CUIT Proveedor": cuit_emisor,
                 "Tipo": tipo,
+                "Comprobante": comprobante,
                 "Neto Gravado": neto,
                 "IVA 21%": iva21,
                 "IVA 10.5%": iva105,
@@ -62,6 +64,7 @@ def generate_entries_and_statements(extracted_docs: List[Dict], condicion_fiscal
                 "Fecha": fecha,
                 "CUIT Cliente": cuit_receptor,
                 "Tipo": tipo,
+                "Comprobante": comprobante,
                 "Neto Gravado": neto,
                 "IVA 21%": iva21,
                 "IVA 10.5%": iva105,
@@ -125,6 +128,30 @@ def _parse_fecha(s):
         return datetime.today().strftime("%d/%m/%Y")
 
 
+def _periodo_mensual(fecha):
+    """'dd/mm/aaaa' -> 'mm/aaaa' (sin fecha, el mes actual)."""
+    return fecha[3:] if fecha and len(fecha) == 10 else datetime.today().strftime("%m/%Y")
+
+
+def _periodo_anual(fecha):
+    return int(fecha[6:]) if fecha and len(fecha) == 10 else datetime.today().year
+
+
+def _por_periodo(rows, periodo_de):
+    grupos = {}
+    for r in rows:
+        grupos.setdefault(periodo_de(r.get("Fecha")), []).append(r)
+    return grupos
+
+
+def _periodos(*grupos, default):
+    """Períodos presentes en los grupos, en orden cronológico; si no hay ninguno, `default`."""
+    todos = set().union(*grupos)
+    if not todos:
+        return [default]
+    return sorted(todos, key=lambda p: p if isinstance(p, int) else p[3:] + p[:2])
+
+
 def _balance_sumas_y_saldos(asientos):
     balance = {}
     for a in asientos:
@@ -166,18 +193,32 @@ def _estado_patrimonio_neto(ee_rr):
 # =======================================================
 
 def _ddjj_iva(compras, ventas):
-    iva_cf = sum(c["IVA 21%"] + c["IVA 10.5%"] for c in compras)
-    iva_df = sum(v["IVA 21%"] + v["IVA 10.5%"] for v in ventas)
-    saldo = iva_df - iva_cf
-    return [{
-        "Periodo": datetime.today().strftime("%m/%Y"),
-        "IVA Crédito Fiscal": iva_cf,
-        "IVA Débito Fiscal": iva_df,
-        "Saldo a Ingresar": saldo
-    }]
+    """Una DDJJ por período mensual (mm/aaaa) según la fecha de los comprobantes."""
+    compras_p = _por_periodo(compras, _periodo_mensual)
+    ventas_p = _por_periodo(ventas, _periodo_mensual)
+    rows = []
+    for periodo in _periodos(compras_p, ventas_p, default=_periodo_mensual(None)):
+        iva_cf = sum(c["IVA 21%"] + c["IVA 10.5%"] for c in compras_p.get(periodo, []))
+        iva_df = sum(v["IVA 21%"] + v["IVA 10.5%"] for v in ventas_p.get(periodo, []))
+        saldo = iva_df - iva_cf
+        rows.append({
+            "Periodo": periodo,
+            "IVA Crédito Fiscal": iva_cf,
+            "IVA Débito Fiscal": iva_df,
+            "Saldo a Ingresar": saldo
+        })
+    return rows
 
 
 def _ddjj_ganancias(asientos, gastos_deducibles):
+    """Una DDJJ por período fiscal (año) según la fecha de los asientos."""
+    asientos_p = _por_periodo(asientos, _periodo_anual)
+    gastos_p = _por_periodo(gastos_deducibles, _periodo_anual)
+    return [_ddjj_ganancias_periodo(periodo, asientos_p.get(periodo, []), gastos_p.get(periodo, []))
+            for periodo in _periodos(asientos_p, gastos_p, default=_periodo_anual(None))]
+
+
+def _ddjj_ganancias_periodo(periodo, asientos, gastos_deducibles):
     ingresos = sum(a["Haber"] for a in asientos if "Venta" in a["Cuenta"])
     costos = sum(a["Debe"] for a in asientos if "Compra" in a["Cuenta"])
     gastos = sum(g["Importe"] for g in gastos_deducibles)
@@ -192,15 +233,15 @@ def _ddjj_ganancias(asientos, gastos_deducibles):
 
     anticipos = round(impuesto / 5, 2)
 
-    return [{
-        "Periodo Fiscal": datetime.today().year,
+    return {
+        "Periodo Fiscal": periodo,
         "Ingresos Gravados": ingresos,
         "Costos": costos,
         "Gastos Deducibles": gastos,
         "Ganancia Neta Imponible": ganancia_neta,
         "Impuesto Determinado": impuesto,
         "Anticipos Estimados": anticipos
-    }]
+    }
 
 
 # =======================================================
@@ -209,21 +250,26 @@ def _ddjj_ganancias(asientos, gastos_deducibles):
 
 def _ddjj_iibb(libro_iva_ventas, condicion_fiscal: str):
     """
-    Determina la base imponible de IIBB según ventas gravadas.
+    Determina la base imponible de IIBB según ventas gravadas, por período mensual.
     Toma 3,5 % general, o 1,75 % si es servicios profesionales.
     """
-    total_ventas = sum(v["Neto Gravado"] for v in libro_iva_ventas)
     if "profesional" in condicion_fiscal.lower():
         alicuota = 0.0175
     else:
         alicuota = 0.035
-    impuesto = total_ventas * alicuota
-    return [{
-        "Jurisdicción": "Tucumán",
-        "Base Imponible": total_ventas,
-        "Alicuota (%)": alicuota * 100,
-        "Impuesto Determinado": round(impuesto, 2)
-    }]
+    ventas_p = _por_periodo(libro_iva_ventas, _periodo_mensual)
+    rows = []
+    for periodo in _periodos(ventas_p, default=_periodo_mensual(None)):
+        total_ventas = sum(v["Neto Gravado"] for v in ventas_p.get(periodo, []))
+        impuesto = total_ventas * alicuota
+        rows.append({
+            "Periodo": periodo,
+            "Jurisdicción": "Tucumán",
+            "Base Imponible": total_ventas,
+            "Alicuota (%)": alicuota * 100,
+            "Impuesto Determinado": round(impuesto, 2)
+        })
+    return rows
 
 
 # =======================================================
@@ -233,13 +279,17 @@ def _ddjj_iibb(libro_iva_ventas, condicion_fiscal: str):
 def _ddjj_bbpp(activos):
     """
     Evalúa bienes declarables (vehículos, inmuebles, activos registrados)
-    aplicando 0,5 % sobre el valor total.
+    aplicando 0,5 % sobre el valor total, por período fiscal (año).
     """
-    total_activos = sum(a["Valor"] for a in activos)
-    impuesto = total_activos * 0.005  # 0.5 %
-    return [{
-        "Periodo Fiscal": datetime.today().year,
-        "Total Bienes Gravados": total_activos,
-        "Alicuota (%)": 0.5,
-        "Impuesto Determinado": round(impuesto, 2)
-    }]
+    activos_p = _por_periodo(activos, _periodo_anual)
+    rows = []
+    for periodo in _periodos(activos_p, default=_periodo_anual(None)):
+        total_activos = sum(a["Valor"] for a in activos_p.get(periodo, []))
+        impuesto = total_activos * 0.005  # 0.5 %
+        rows.append({
+            "Periodo Fiscal": periodo,
+            "Total Bienes Gravados": total_activos,
+            "Alicuota (%)": 0.5,
+            "Impuesto Determinado": round(impuesto, 2)
+        })
+    return rows
@@ -1,66 +1,256 @@
-import os
+import io, os, zipfile
 from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 BASE_PATH = "./exports/afip"
+BUFFER_SIZE = 1 << 16
 
-def ensure_dir():
-    os.makedirs(BASE_PATH, exist_ok=True)
+def ensure_dir(out_dir: str = BASE_PATH):
+    os.makedirs(out_dir, exist_ok=True)
 
 # ===================================================
 # =============== EXPORTADORES AFIP =================
 # ===================================================
+# Cada exportador genera un TXT por período (tomado de las filas de la DDJJ,
+# que el motor contable arma según la fecha de los comprobantes) y devuelve
+# la lista de rutas. `out_dir` permite que cada request escriba en su propia carpeta.
 
-def export_ddjj_iva(ddjj_iva: dict):
+def export_ddjj_iva(ddjj_iva: dict, out_dir: str = BASE_PATH) -> List[str]:
     """
     Genera TXT compatible con Libro IVA Digital / F.2002
     Campos: Periodo;IVA_CF;IVA_DF;Saldo
     """
-    ensure_dir()
-    fpath = os.path.join(BASE_PATH, f"ddjj_iva_{datetime.today().strftime('%Y%m')}.txt")
-    with open(fpath, "w", encoding="utf-8") as f:
-        for r in ddjj_iva:
-            linea = f"{r['Periodo']};{r['IVA Crédito Fiscal']:.2f};{r['IVA Débito Fiscal']:.2f};{r['Saldo a Ingresar']:.2f}\n"
-            f.write(linea)
-    return fpath
+    return [_export_txt(n, l, out_dir=out_dir) for _, n, l in _archivos_ddjj("iva", ddjj_iva)]
 
 
-def export_ddjj_ganancias(ddjj_ganancias: dict):
+def export_ddjj_ganancias(ddjj_ganancias: dict, out_dir: str = BASE_PATH) -> List[str]:
     """
     Genera TXT simplificado para F.713 (Ganancias)
     Campos: Periodo;Ingresos;Costos;Gastos;Ganancia;Impuesto;Anticipos
     """
-    ensure_dir()
-    fpath = os.path.join(BASE_PATH, f"ddjj_ganancias_{datetime.today().year}.txt")
-    with open(fpath, "w", encoding="utf-8") as f:
-        for r in ddjj_ganancias:
-            linea = f"{r['Periodo Fiscal']};{r['Ingresos Gravados']:.2f};{r['Costos']:.2f};{r['Gastos Deducibles']:.2f};{r['Ganancia Neta Imponible']:.2f};{r['Impuesto Determinado']:.2f};{r['Anticipos Estimados']:.2f}\n"
-            f.write(linea)
-    return fpath
+    return [_export_txt(n, l, out_dir=out_dir) for _, n, l in _archivos_ddjj("ganancias", ddjj_ganancias)]
 
 
-def export_ddjj_iibb(ddjj_iibb: dict):
+def export_ddjj_iibb(ddjj_iibb: dict, periodo: Optional[str] = None, out_dir: str = BASE_PATH) -> List[str]:
     """
     TXT compatible con SIFERE Local (jurisdicción Tucumán)
     Campos: Jurisdiccion;Base;Alicuota;Impuesto
+    `periodo` (AAAAMM) sólo se usa para filas sin "Periodo" (resultados viejos).
     """
-    ensure_dir()
-    fpath = os.path.join(BASE_PATH, f"ddjj_iibb_{datetime.today().strftime('%Y%m')}.txt")
-    with open(fpath, "w", encoding="utf-8") as f:
-        for r in ddjj_iibb:
-            linea = f"{r['Jurisdicción']};{r['Base Imponible']:.2f};{r['Alicuota (%)']:.2f};{r['Impuesto Determinado']:.2f}\n"
-            f.write(linea)
-    return fpath
+    return [_export_txt(n, l, out_dir=out_dir) for _, n, l in _archivos_ddjj("iibb", ddjj_iibb, periodo)]
 
 
-def export_ddjj_bbpp(ddjj_bbpp: dict):
+def export_ddjj_bbpp(ddjj_bbpp: dict, out_dir: str = BASE_PATH) -> List[str]:
     """
     TXT base para F.762 (Bienes Personales)
     Campos: Periodo;TotalBienes;Alicuota;Impuesto
     """
-    ensure_dir()
-    fpath = os.path.join(BASE_PATH, f"ddjj_bbpp_{datetime.today().year}.txt")
-    with open(fpath, "w", encoding="utf-8") as f:
-        for r in ddjj_bbpp:
-            linea = f"{r['Periodo Fiscal']};{r['Total Bienes Gravados']:.2f};{r['Alicuota (%)']:.2f};{r['Impuesto Determinado']:.2f}\n"
-            f.write(linea)
+    return [_export_txt(n, l, out_dir=out_dir) for _, n, l in _archivos_ddjj("bbpp", ddjj_bbpp)]
+
+
+def export_libro_iva(rows: List[dict], tipo: str, out_dir: str = BASE_PATH) -> List[str]:
+    """
+    Libro IVA Digital (RG 4597): un par de archivos de ancho fijo por período,
+    LIBRO_IVA_{COMPRAS|VENTAS}_CBTE_AAAAMM.txt y ..._ALICUOTAS_AAAAMM.txt.
+    `tipo` es "compras" o "ventas".
+    """
+    paths = []
+    for nombre, lineas in _archivos_libro_iva(rows, tipo):
+        paths.append(_export_txt(nombre, lineas, newline="\r\n", encoding="latin-1", out_dir=out_dir))
+    return paths
+
+
+def export_paquete(pkg: Dict, tipo: str, out_dir: str) -> List[str]:
+    """Todos los TXT de un tipo (iva, ganancias, iibb, bbpp, libro_iva) para un paquete; mismos archivos que el ZIP masivo."""
+    return [_export_txt(nombre, lineas, newline=newline, encoding=encoding, out_dir=out_dir)
+            for _, nombre, lineas, newline, encoding in _archivos_paquete(pkg, [tipo])]
+
+
+# ===================================================
+# ============ EXPORTACIÓN MASIVA (ZIP) =============
+# ===================================================
+
+TIPOS_BULK = ["iva", "ganancias", "iibb", "bbpp", "libro_iva"]
+
+
+def export_bulk(paquetes: Iterable[Tuple[str, Dict]], out_path: str,
+                tipos: Optional[List[str]] = None, periodos: Optional[List[str]] = None) -> str:
+    """
+    Genera en una sola pasada los TXT de muchos clientes y períodos dentro de un ZIP.
+    - `paquetes`: iterable de (cuit, contenido_json); puede ser un generador sobre la DB.
+      Si un archivo se repite para un mismo CUIT, gana la primera aparición.
+    - `tipos`: subconjunto de TIPOS_BULK (por defecto todos).
+    - `periodos`: filtra por período del archivo; "AAAA" incluye también los
+      mensuales de ese año, "AAAAMM" sólo ese mes. None = todos.
+    Cada TXT se escribe directo dentro del ZIP, sin archivos intermedios.
+    """
+    tipos = tipos or TIPOS_BULK
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    escritos = set()
+    with zipfile.ZipFile(out_path, "w", zipfile.ZIP_DEFLATED) as z:
+        for cuit, pkg in paquetes:
+            for periodo, nombre, lineas, newline, encoding in _archivos_paquete(pkg, tipos):
+                arcname = f"{cuit}/{nombre}"
+                if arcname in escritos or (periodos and not any(periodo.startswith(p) for p in periodos)):
+                    continue
+                escritos.add(arcname)
+                with z.open(arcname, "w") as raw:
+                    with io.TextIOWrapper(io.BufferedWriter(raw, BUFFER_SIZE), encoding=encoding,
+                                          errors="replace", newline=newline) as f:
+                        f.writelines(lineas)
+    return out_path
+
+
+def _archivos_paquete(pkg: Dict, tipos: List[str]) -> Iterator[Tuple[str, str, Iterable[str], str, str]]:
+    """(periodo, nombre, lineas, newline, encoding) de cada TXT que se puede generar del paquete."""
+    for tipo in ("iva", "ganancias", "iibb", "bbpp"):
+        rows = pkg.get(f"ddjj_{tipo}")
+        if tipo in tipos and rows:
+            # IIBB de resultados viejos no trae "Periodo": se usa el de la DDJJ de IVA
+            default = _periodo_fila("iva", pkg["ddjj_iva"][0]) if tipo == "iibb" and pkg.get("ddjj_iva") else None
+            for periodo, nombre, lineas in _archivos_ddjj(tipo, rows, default):
+                yield periodo, nombre, lineas, "\n", "utf-8"
+    if "libro_iva" in tipos:
+        for tipo in ("compras", "ventas"):
+            for nombre, lineas in _archivos_libro_iva(pkg.get(f"libro_iva_{tipo}") or [], tipo):
+                yield nombre[-10:-4], nombre, lineas, "\r\n", "latin-1"
+
+
+# =======================================================
+# =============== FUNCIONES AUXILIARES ==================
+# =======================================================
+
+def _export_txt(nombre: str, lineas: Iterable[str], newline: str = "\n", encoding: str = "utf-8",
+                out_dir: str = BASE_PATH) -> str:
+    ensure_dir(out_dir)
+    fpath = os.path.join(out_dir, nombre)
+    with open(fpath, "w", encoding=encoding, errors="replace", newline=newline, buffering=BUFFER_SIZE) as f:
+        f.writelines(lineas)
     return fpath
+
+
+def _archivos_ddjj(tipo: str, rows: List[dict], default: Optional[str] = None) -> Iterator[Tuple[str, str, Iterable[str]]]:
+    """Agrupa las filas de la DDJJ por período y devuelve (periodo, nombre, lineas) de cada TXT."""
+    grupos: Dict[str, List[dict]] = {}
+    for r in rows:
+        grupos.setdefault(_periodo_fila(tipo, r, default), []).append(r)
+    for periodo in sorted(grupos):
+        yield periodo, f"ddjj_{tipo}_{periodo}.txt", LINEAS[tipo](grupos[periodo])
+
+
+def _periodo_fila(tipo: str, r: dict, default: Optional[str] = None) -> str:
+    """AAAA para Ganancias/BBPP; 'mm/aaaa' -> AAAAMM para IVA/IIBB."""
+    if tipo in ("ganancias", "bbpp"):
+        return str(r.get("Periodo Fiscal") or datetime.today().year)
+    v = str(r.get("Periodo") or "")
+    if len(v) == 7 and v[2] == "/":
+        return v[3:] + v[:2]
+    return default or datetime.today().strftime('%Y%m')
+
+
+def _lineas_iva(rows):
+    for r in rows:
+        yield f"{r['Periodo']};{r['IVA Crédito Fiscal']:.2f};{r['IVA Débito Fiscal']:.2f};{r['Saldo a Ingresar']:.2f}\n"
+
+
+def _lineas_ganancias(rows):
+    for r in rows:
+        yield f"{r['Periodo Fiscal']};{r['Ingresos Gravados']:.2f};{r['Costos']:.2f};{r['Gastos Deducibles']:.2f};{r['Ganancia Neta Imponible']:.2f};{r['Impuesto Determinado']:.2f};{r['Anticipos Estimados']:.2f}\n"
+
+
+def _lineas_iibb(rows):
+    for r in rows:
+        yield f"{r['Jurisdicción']};{r['Base Imponible']:.2f};{r['Alicuota (%)']:.2f};{r['Impuesto Determinado']:.2f}\n"
+
+
+def _lineas_bbpp(rows):
+    for r in rows:
+        yield f"{r['Periodo Fiscal']};{r['Total Bienes Gravados']:.2f};{r['Alicuota (%)']:.2f};{r['Impuesto Determinado']:.2f}\n"
+
+
+LINEAS = {"iva": _lineas_iva, "ganancias": _lineas_ganancias, "iibb": _lineas_iibb, "bbpp": _lineas_bbpp}
+
+
+# =======================================================
+# ============ LIBRO IVA DIGITAL (RG 4597) ===============
+# =======================================================
+
+TIPOS_COMPROBANTE = {"FACTURA A": "001", "FACTURA B": "006", "FACTURA C": "011"}
+ALICUOTAS = (("IVA 21%", "0005", 0.21), ("IVA 10.5%", "0004", 0.105))
+
+
+def _archivos_libro_iva(rows: List[dict], tipo: str) -> Iterator[Tuple[str, List[str]]]:
+    """Agrupa las filas del libro por período (AAAAMM) y genera CBTE + ALICUOTAS de cada uno."""
+    por_periodo: Dict[str, List[dict]] = {}
+    for r in rows:
+        f = r.get("Fecha") or ""
+        periodo = f[6:10] + f[3:5] if len(f) == 10 else datetime.today().strftime('%Y%m')
+        por_periodo.setdefault(periodo, []).append(r)
+    for periodo in sorted(por_periodo):
+        grupo = por_periodo[periodo]
+        cbte, alic = [], []
+        for r in grupo:
+            c, a = _lid_registros(r, tipo)
+            cbte.append(c + "\n")
+            alic.extend(x + "\n" for x in a)
+        base = f"LIBRO_IVA_{tipo.upper()}"
+        yield f"{base}_CBTE_{periodo}.txt", cbte
+        yield f"{base}_ALICUOTAS_{periodo}.txt", alic
+
+
+def _lid_registros(r: dict, tipo: str) -> Tuple[str, List[str]]:
+    """Registro de comprobante y registros de alícuotas (ancho fijo, sin separadores)."""
+    f = r.get("Fecha") or ""
+    fecha = f[6:10] + f[3:5] + f[0:2] if len(f) == 10 else "0" * 8
+    tipo_cbte = TIPOS_COMPROBANTE.get((r.get("Tipo") or "").upper(), "099")
+    pv, nro = _pv_nro(r.get("Comprobante"))
+    cuit = "".join(ch for ch in str(r.get("CUIT Proveedor") or r.get("CUIT Cliente") or "") if ch.isdigit())
+    doc = "80" if len(cuit) == 11 else "99"
+
+    netos = _netos_por_alicuota(r)
+    cant = str(len(netos))[:1]
+    cero = _imp(0)
+
+    if tipo == "compras":
+        iva_total = sum(imp for _, _, imp in netos)
+        cbte = (fecha + tipo_cbte + pv + nro + " " * 16 + doc + cuit.rjust(20, "0") + " " * 30
+                + _imp(r.get("Total")) + cero * 7 + "PES" + "0001000000" + cant + "0"
+                + _imp(iva_total) + cero + "0" * 11 + " " * 30 + cero)
+        alic = [tipo_cbte + pv + nro + doc + cuit.rjust(20, "0") + _imp(neto) + cod + _imp(imp)
+                for neto, cod, imp in netos]
+    else:
+        cbte = (fecha + tipo_cbte + pv + nro + nro + doc + cuit.rjust(20, "0") + " " * 30
+                + _imp(r.get("Total")) + cero * 7 + "PES" + "0001000000" + cant + "0"
+                + cero + "0" * 8)
+        alic = [tipo_cbte + pv + nro + _imp(neto) + cod + _imp(imp) for neto, cod, imp in netos]
+    return cbte, alic
+
+
+def _netos_por_alicuota(r: dict) -> List[Tuple[float, str, float]]:
+    """
+    Reparte el neto gravado entre alícuotas. Si hay una sola, lleva todo el neto;
+    si hay varias, el neto de cada una sale de su impuesto.
+    """
+    neto = r.get("Neto Gravado") or 0.0
+    con_iva = [(cod, tasa, r.get(campo) or 0.0) for campo, cod, tasa in ALICUOTAS if r.get(campo)]
+    if not con_iva:
+        return [(neto, "0003", 0.0)]  # 0 %
+    if len(con_iva) == 1:
+        cod, _, imp = con_iva[0]
+        return [(neto, cod, imp)]
+    return [(round(imp / tasa, 2), cod, imp) for cod, tasa, imp in con_iva]
+
+
+def _pv_nro(comprobante) -> Tuple[str, str]:
+    # "0001-00012345" -> ("00001", "00000000000000012345")
+    s = str(comprobante or "")
+    pv, _, nro = s.rpartition("-")
+    pv = "".join(ch for ch in pv if ch.isdigit())
+    nro = "".join(ch for ch in nro if ch.isdigit())
+    return pv.rjust(5, "0")[-5:], nro.rjust(20, "0")[-20:]
+
+
+def _imp(v) -> str:
+    """Importe en centavos, 15 posiciones, con signo '-' delante si es negativo."""
+    c = int(round((v or 0.0) * 100))
+    return ("-" + str(-c).rjust(14, "0")) if c < 0 else str(c).rjust(15, "0")
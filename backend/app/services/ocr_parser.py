@@ -3,10 +3,45 @@ from typing import Dict
 import logging
 import re
 import os
+from .startup import timed_import
 
 
 logger = logging.getLogger(__name__)
 
+# Regex compiladas una sola vez (se aplican sobre el texto en mayúsculas)
+RE_TIPO = re.compile(r"FACTURA\s+([ABC])")
+RE_PV_NRO = re.compile(r"(?:P\.?V\.?|PTO\.?\s*VTA\.?|PUNTO\s*DE\s*VENTA)\s*[:\-]?\s*(\d{4}).{0,4}(?:Nro\.?|Nº|N°|NUMERO|N°:)\s*[:\-]?\s*(\d{8})")
+RE_NRO_SIMPLE = re.compile(r"(?:Nro\.?|Nº|N°)\s*[:\-]?\s*(\d{8})")
+RE_FECHA = re.compile(r"FECHA\s*[:\s]*(\d{2}/\d{2}/\d{4})")
+RE_CUIT = re.compile(r"CUIT\s*(?:NRO|Nº|N°|:)?\s*([0-9\-.]{8,13})")
+RE_NO_DIGITOS = re.compile(r"[^0-9]")
+RE_IVA = re.compile(r"IVA\s*CONTENIDO\s*[:\s]*\$?\s*([0-9\.\,]+)")
+RE_TOTAL = re.compile(r"TOTAL\s*\$?\s*([0-9\.\,]+)")
+RE_CAE = re.compile(r"C\.?A\.?E\.?\s*[:\s]*([0-9]{10,20})")
+RE_VTO_CAE = re.compile(r"VENCIMIENTO\s*C\.?A\.?E\.?\s*[:\s]*(\d{2}/\d{2}/\d{4})")
+
+
+def _tesseract():
+    pytesseract = timed_import("pytesseract")
+    cmd = os.getenv("TESSERACT_CMD")
+    if cmd:
+        pytesseract.pytesseract.tesseract_cmd = cmd
+    return pytesseract
+
+
+def warmup():
+    """
+    Precarga PIL, pytesseract y pdfplumber y corre un OCR mínimo para que el
+    primer documento real no pague la carga del binario y del modelo `spa`.
+    """
+    try:
+        Image = timed_import("PIL.Image")
+        _tesseract().image_to_string(Image.new("L", (32, 32), 255), lang="spa")
+    except Exception:
+        logger.exception("No se pudo precalentar el OCR")
+    timed_import("pdfplumber", optional=True)
+
+
 def _read_text(path: str) -> str:
     """Lee texto de PDF (si tiene texto) o de imagen (si hay Tesseract). Devuelve '' si no puede."""
     path_l = path.lower()
@@ -15,7 +50,7 @@ def _read_text(path: str) -> str:
     # PDF con texto embebido
     if path_l.endswith(".pdf"):
         try:
-            import pdfplumber  # requiere pdfplumber en requirements si querés usarlo
+            pdfplumber = timed_import("pdfplumber")  # requiere pdfplumber en requirements si querés usarlo
             with pdfplumber.open(path) as pdf:
                 pages = [p.extract_text() or "" for p in pdf.pages]
             text = "\n".join(pages)
@@ -26,12 +61,11 @@ def _read_text(path: str) -> str:
     # Imagen con OCR (opcional)
     if not text and path_l.endswith((".png", ".jpg", ".jpeg", ".tif", ".tiff")):
         try:
-            from PIL import Image
-            import pytesseract
+            Image = timed_import("PIL.Image")
             img = Image.open(path)
             # pequeño preprocesado robusto
             img = img.convert("L")
-            text = pytesseract.image_to_string(img, lang="spa")
+            text = _tesseract().image_to_string(img, lang="spa")
         except Exception:
             logger.exception("Error realizando OCR sobre la imagen %s", path)
             text = ""
@@ -64,7 +98,7 @@ def extract_fields_from_file(path: str, tipo: str) -> Dict:
 
     # Tipo de comprobante (A/B/C) y/o literal FACTURA
     tipo_comp = None
-    m_tipo = re.search(r"FACTURA\s+([ABC])", U)
+    m_tipo = RE_TIPO.search(U)
     if m_tipo:
         tipo_comp = f"FACTURA {m_tipo.group(1)}"
     elif "FACTURA" in U:
@@ -75,40 +109,40 @@ def extract_fields_from_file(path: str, tipo: str) -> Dict:
     # Punto de venta y número (acepta “Nro: 0001-00012345” o variantes)
     pv = None
     nro = None
-    m_pv_nro = re.search(r"(?:P\.?V\.?|PTO\.?\s*VTA\.?|PUNTO\s*DE\s*VENTA)\s*[:\-]?\s*(\d{4}).{0,4}(?:Nro\.?|Nº|N°|NUMERO|N°:)\s*[:\-]?\s*(\d{8})", U)
+    m_pv_nro = RE_PV_NRO.search(U)
     if m_pv_nro:
         pv, nro = m_pv_nro.group(1), m_pv_nro.group(2)
     else:
-        m_nro_simple = re.search(r"(?:Nro\.?|Nº|N°)\s*[:\-]?\s*(\d{8})", U)
+        m_nro_simple = RE_NRO_SIMPLE.search(U)
         if m_nro_simple:
             nro = m_nro_simple.group(1)
 
     # Fecha dd/mm/aaaa
-    m_fecha = re.search(r"FECHA\s*[:\s]*(\d{2}/\d{2}/\d{4})", U)
+    m_fecha = RE_FECHA.search(U)
     fecha = m_fecha.group(1) if m_fecha else None
 
     # CUIT emisor (el primero que aparezca como “CUIT …”)
-    m_cuit = re.search(r"CUIT\s*(?:NRO|Nº|N°|:)?\s*([0-9\-.]{8,13})", U)
+    m_cuit = RE_CUIT.search(U)
     cuit_emisor = None
     if m_cuit:
-        cuit_emisor = re.sub(r"[^0-9]", "", m_cuit.group(1))
+        cuit_emisor = RE_NO_DIGITOS.sub("", m_cuit.group(1))
 
     # TOTAL e IVA Contenido
     # Buscar primero “IVA Contenido: $ 7.413,52”
-    m_iva = re.search(r"IVA\s*CONTENIDO\s*[:\s]*\$?\s*([0-9\.\,]+)", U)
+    m_iva = RE_IVA.search(U)
     iva_contenido = _num(m_iva.group(1)) if m_iva else 0.0
 
     # TOTAL al pie (“TOTAL $ 42.716,00” o “TOTAL 42.716,00”)
-    m_total = re.search(r"TOTAL\s*\$?\s*([0-9\.\,]+)", U)
+    m_total = RE_TOTAL.search(U)
     total = _num(m_total.group(1)) if m_total else 0.0
 
     # Neto estimado = total - iva (si ambos existen)
     neto = round(total - iva_contenido, 2) if total and iva_contenido else 0.0
 
     # CAE y Vto CAE
-    m_cae = re.search(r"C\.?A\.?E\.?\s*[:\s]*([0-9]{10,20})", U)
+    m_cae = RE_CAE.search(U)
     cae = m_cae.group(1) if m_cae else None
-    m_vto = re.search(r"VENCIMIENTO\s*C\.?A\.?E\.?\s*[:\s]*(\d{2}/\d{2}/\d{4})", U)
+    m_vto = RE_VTO_CAE.search(U)
     vto_cae = m_vto.group(1) if m_vto else None
 
     return {
@@ -0,0 +1,106 @@
+import base64, hashlib, json
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# ======================================================
+# ====== PREVISUALIZACIÓN PAGINADA DE RESULTADOS =======
+# ======================================================
+
+CUIT_FIELDS = ("CUIT Proveedor", "CUIT Cliente", "CUIT", "Detalle")
+
+
+def section_rows(pkg: Dict, seccion: str) -> List[dict]:
+    """Filas planas de una sección del paquete. `mayor` se arma desde los asientos."""
+    if seccion == "mayor":
+        return sorted(pkg.get("asientos", []), key=lambda a: (a["Cuenta"], _fecha_key(a.get("Fecha"))))
+    return pkg.get(seccion, []) or []
+
+
+def query_rows(rows: List[dict], cuenta: Optional[str] = None, desde: Optional[str] = None,
+               hasta: Optional[str] = None, cuit: Optional[str] = None,
+               sort: Optional[str] = None, order: str = "asc") -> List[dict]:
+    """
+    Filtra y ordena filas:
+    - cuenta: coincidencia exacta (sin distinguir mayúsculas) sobre "Cuenta".
+    - desde/hasta: fechas dd/mm/aaaa inclusive sobre "Fecha".
+    - cuit: dígitos (se ignoran guiones y puntos), busca en los campos de CUIT o en el detalle.
+    Filtros mal formados => ValueError.
+    """
+    if desde:
+        d = _fecha_filtro(desde, "desde")
+    if hasta:
+        h = _fecha_filtro(hasta, "hasta")
+    if cuit:
+        digits = cuit.strip().replace("-", "").replace(".", "")
+        if not digits.isdigit():
+            raise ValueError("cuit inválido (sólo dígitos)")
+    if cuenta:
+        c = cuenta.strip().lower()
+        rows = [r for r in rows if (r.get("Cuenta") or "").lower() == c]
+    if desde:
+        rows = [r for r in rows if _fecha_key(r.get("Fecha")) >= d]
+    if hasta:
+        rows = [r for r in rows if _fecha_key(r.get("Fecha")) <= h]
+    if cuit:
+        rows = [r for r in rows if any(digits in str(r.get(f) or "") for f in CUIT_FIELDS)]
+    if sort:
+        key = _fecha_key if sort == "Fecha" else _sort_key
+        rows = sorted(rows, key=lambda r: key(r.get(sort)), reverse=(order == "desc"))
+    return rows
+
+
+def paginate(rows: List[dict], cursor: Optional[str], limit: int) -> Dict:
+    """Paginación por cursor opaco (offset codificado). El paquete es inmutable, así que es estable."""
+    start = decode_cursor(cursor)
+    page = rows[start:start + limit]
+    end = start + len(page)
+    return {
+        "items": page,
+        "total": len(rows),
+        "next_cursor": encode_cursor(end) if end < len(rows) else None,
+    }
+
+
+def encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(str(offset).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        return max(int(base64.urlsafe_b64decode(cursor + pad).decode()), 0)
+    except Exception:
+        raise ValueError("cursor inválido")
+
+
+def make_etag(result_id: int, generado: str, params: Dict) -> str:
+    """
+    ETag débil: mismo resultado + mismos parámetros => misma respuesta.
+    `generado` (fecha_generacion) distingue resultados que reusan un id borrado.
+    """
+    raw = json.dumps([result_id, generado, params], sort_keys=True, default=str).encode()
+    return f'W/"{hashlib.sha1(raw).hexdigest()}"'
+
+
+def _fecha_filtro(s: str, nombre: str) -> str:
+    try:
+        return datetime.strptime(s.strip(), "%d/%m/%Y").strftime("%Y%m%d")
+    except ValueError:
+        raise ValueError(f"{nombre} inválido (dd/mm/aaaa)")
+
+
+def _fecha_key(s) -> str:
+    # dd/mm/aaaa -> aaaammdd para comparar y ordenar
+    if not s or len(s) != 10:
+        return ""
+    return s[6:10] + s[3:5] + s[0:2]
+
+
+def _sort_key(v):
+    if v is None:
+        return (0, 0, "")
+    if isinstance(v, (int, float)):
+        return (1, v, "")
+    return (2, 0, str(v))
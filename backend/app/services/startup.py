@@ -0,0 +1,70 @@
+import importlib, logging, os, sys, time
+from typing import Dict, List
+
+# ======================================================
+# ============ PERFIL DE ARRANQUE / WARM-UP ============
+# ======================================================
+
+logger = logging.getLogger(__name__)
+
+# Módulos pesados por perfil. Las rutas los importan bajo demanda; el warm-up
+# los carga antes de que el worker reciba tráfico.
+PROFILES = {
+    "ocr": ["PIL.Image", "pytesseract", "pdfplumber", "app.services.ocr_parser"],
+    "export": ["openpyxl", "app.services.excel_export", "app.services.afip_export", "app.services.zip_export"],
+    "validate": ["numpy"],
+}
+
+IMPORT_TIMES: Dict[str, float] = {}
+
+
+def profiles_from_env() -> List[str]:
+    """WARMUP=ocr,export (o "all"). Vacío = sin warm-up."""
+    raw = os.getenv("WARMUP", "").strip()
+    if raw == "all":
+        return list(PROFILES)
+    profiles = []
+    for p in (p.strip() for p in raw.split(",") if p.strip()):
+        if p in PROFILES:
+            profiles.append(p)
+        else:
+            logger.warning("WARMUP: perfil desconocido %r (válidos: %s, all)", p, ", ".join(PROFILES))
+    return profiles
+
+
+def timed_import(name: str, optional: bool = False):
+    """
+    Importa un módulo y registra cuánto tardó en ms. Si ya estaba cargado lo
+    devuelve sin registrar nada. Con `optional` devuelve None si no está instalado.
+    """
+    mod = sys.modules.get(name)
+    if mod is not None:
+        return mod
+    t0 = time.perf_counter()
+    try:
+        mod = importlib.import_module(name)
+    except ImportError:
+        if not optional:
+            raise
+        logger.warning("Módulo opcional no disponible: %s", name)
+        return None
+    record_import(name, t0)
+    return mod
+
+
+def record_import(name: str, t0: float) -> None:
+    IMPORT_TIMES[name] = round((time.perf_counter() - t0) * 1000, 1)
+
+
+def warmup(profiles: List[str]) -> Dict[str, float]:
+    """Precarga los módulos de cada perfil y, para OCR, el motor Tesseract."""
+    for p in profiles:
+        for name in PROFILES[p]:
+            timed_import(name, optional=True)
+        if p == "ocr":
+            from .ocr_parser import warmup as ocr_warmup
+            t0 = time.perf_counter()
+            ocr_warmup()
+            record_import("ocr_engine", t0)
+    logger.info("Warm-up %s (ms): %s", profiles, IMPORT_TIMES)
+    return dict(IMPORT_TIMES)
@@ -0,0 +1,155 @@
+import os, fcntl, hashlib, io, uuid
+import aiofiles
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import ContextManager, Optional, Tuple
+
+# ======================================================
+# ========== ALMACENAMIENTO DE DOCUMENTOS ==============
+# ======================================================
+
+CHUNK_SIZE = 1024 * 1024
+THUMB_DIR = "_thumbs"
+THUMB_SIZES = (128, 256, 512)
+
+
+class StorageBackend(ABC):
+    """
+    Interfaz de almacenamiento de documentos. `commit` devuelve una clave relativa
+    al almacenamiento (ab/cd/<sha256>.ext), que es lo que se guarda en `Document.path`;
+    cada backend la resuelve internamente.
+    Uso típico en una subida:
+        staged = await storage.stage(upload_file)
+        with storage.lock():
+            key = storage.commit(staged, ext)
+            ... insertar Document(path=key) y commit ...
+    `lock()` también debe envolver la búsqueda de referencias + `delete`, así una
+    subida duplicada nunca queda apuntando a un archivo recién borrado.
+    """
+
+    @abstractmethod
+    async def stage(self, file) -> Tuple[str, str]:
+        """Lee el UploadFile por bloques y devuelve (sha256, token del temporal)."""
+
+    @abstractmethod
+    def commit(self, staged: Tuple[str, str], ext: str) -> str:
+        """Publica el temporal y devuelve su clave (dedup por contenido)."""
+
+    @abstractmethod
+    def lock(self) -> ContextManager:
+        """Exclusión entre altas y bajas de archivos (bloqueante: llamar fuera del event loop)."""
+
+    @abstractmethod
+    def local_path(self, key: str) -> str:
+        """Ruta local legible (un backend remoto descargaría a una caché)."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Borra el archivo y sus derivados. Sólo llamar cuando ya no tiene referencias."""
+
+    @abstractmethod
+    def thumbnail(self, key: str, size: int = 256) -> Optional[bytes]:
+        """JPEG con lado mayor = `size`, o None si el archivo no es una imagen legible."""
+
+
+class LocalStorage(StorageBackend):
+    """
+    Almacenamiento direccionado por contenido en disco local.
+    - Clave = sha256 del archivo, particionado por prefijo (ab/cd/abcd...ext), relativa a `root`.
+    - Archivos idénticos (aunque sean de distintos clientes) se guardan una sola vez.
+    - Las miniaturas se generan bajo demanda y quedan cacheadas en `_thumbs/`.
+    - `lock()` usa flock sobre `root/.lock`, válido entre workers del mismo host.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def key_for(self, digest: str, ext: str) -> str:
+        return f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+    async def stage(self, file) -> Tuple[str, str]:
+        tmp = self._temp_path()
+        h = hashlib.sha256()
+        async with aiofiles.open(tmp, "wb") as f:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk: break
+                h.update(chunk)
+                await f.write(chunk)
+        return h.hexdigest(), tmp
+
+    def commit(self, staged: Tuple[str, str], ext: str) -> str:
+        """Mueve el temporal a su ruta final; si el contenido ya existía lo descarta (dedup)."""
+        digest, tmp_path = staged
+        key = self.key_for(digest, ext)
+        dest = self.local_path(key)
+        if os.path.exists(dest):
+            os.remove(tmp_path)
+            return key
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(tmp_path, dest)
+        return key
+
+    @contextmanager
+    def lock(self):
+        with open(os.path.join(self.root, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def local_path(self, key: str) -> str:
+        # Documentos viejos guardaban la ruta completa (./data/storage/<uuid>.ext)
+        if os.path.isabs(key) or os.path.normpath(key).startswith(os.path.normpath(self.root) + os.sep):
+            return key
+        return os.path.join(self.root, key)
+
+    def delete(self, key: str) -> None:
+        path = self.local_path(key)
+        if os.path.exists(path):
+            os.remove(path)
+        digest = _digest_from_path(key)
+        for size in THUMB_SIZES:
+            t = self._thumb_path(digest, size)
+            if os.path.exists(t):
+                os.remove(t)
+
+    def thumbnail(self, key: str, size: int = 256) -> Optional[bytes]:
+        """La genera la primera vez y la reutiliza después."""
+        if not key.lower().endswith((".png", ".jpg", ".jpeg", ".tif", ".tiff")):
+            return None
+        size = min(THUMB_SIZES, key=lambda s: abs(s - size))
+        dest = self._thumb_path(_digest_from_path(key), size)
+        if not os.path.exists(dest):
+            from PIL import Image, UnidentifiedImageError
+            buf = io.BytesIO()
+            try:
+                with Image.open(self.local_path(key)) as img:
+                    img.thumbnail((size, size))
+                    img.convert("RGB").save(buf, "JPEG", quality=80, optimize=True)
+            except (UnidentifiedImageError, OSError):
+                return None  # extensión de imagen pero contenido ilegible
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            tmp = self._temp_path()
+            with open(tmp, "wb") as f:
+                f.write(buf.getvalue())
+            os.replace(tmp, dest)
+            return buf.getvalue()
+        with open(dest, "rb") as f:
+            return f.read()
+
+    def _temp_path(self) -> str:
+        """Temporal dentro de `root` para que `os.replace` sea atómico."""
+        tmp_dir = os.path.join(self.root, "_tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        return os.path.join(tmp_dir, uuid.uuid4().hex)
+
+    def _thumb_path(self, digest: str, size: int) -> str:
+        return os.path.join(self.root, THUMB_DIR, digest[:2], f"{digest}_{size}.jpg")
+
+
+def _digest_from_path(path: str) -> str:
+    # Rutas viejas (uuid plano) también funcionan: se usa el nombre como clave.
+    return os.path.splitext(os.path.basename(path))[0]
@@ -1,3 +1,10 @@
+from typing import Dict, Iterable, List
+from .startup import timed_import
+
+def normalize_cuit(cuit: str) -> str:
+    """'20-12345678-6' -> '20123456786'. Es la forma en que se guarda en `clientes.cuit`."""
+    return "".join(ch for ch in (cuit or "") if "0" <= ch <= "9")
+
 
 def validate_cuit(cuit: str) -> bool:
     digits = [int(d) for d in cuit if d.isdigit()]
@@ -8,3 +15,38 @@ def validate_cuit(cuit: str) -> bool:
     mod = 11 - (s % 11)
     dv = 0 if mod == 11 else (9 if mod == 10 else mod)
     return dv == digits[-1]
+
+
+def validate_cuits(cuits: Iterable[str]):
+    """
+    Versión vectorizada de `validate_cuit` para lotes grandes.
+    Devuelve un array bool alineado con la entrada (None o largo != 11 => False).
+    """
+    np = timed_import("numpy")  # perezoso: sólo lo pagan las rutas que validan en lote
+    norm = [normalize_cuit(c) for c in cuits]
+    ok = np.fromiter((len(c) == 11 for c in norm), dtype=bool, count=len(norm))
+    idx = np.flatnonzero(ok)
+    if not len(idx):
+        return ok
+    buf = "".join(norm[i] for i in idx).encode("ascii")
+    digits = (np.frombuffer(buf, dtype=np.uint8).reshape(-1, 11) - ord("0")).astype(np.int64)
+    mod = 11 - (digits[:, :10] @ np.array([5,4,3,2,7,6,5,4,3,2], dtype=np.int64)) % 11
+    dv = np.where(mod == 11, 0, np.where(mod == 10, 9, mod))
+    ok[idx] = dv == digits[:, 10]
+    return ok
+
+
+def flag_invalid_cuits(extracted: List[Dict], campos=("cuit_emisor", "cuit_receptor")) -> List[Dict]:
+    """
+    Valida en lote los CUIT extraídos por OCR y devuelve los hallazgos
+    (probables errores de lectura), con el índice del documento en `extracted`.
+    """
+    refs = [(i, campo) for i, d in enumerate(extracted) for campo in campos if d.get(campo)]
+    if not refs:
+        return []
+    valid = validate_cuits(extracted[i][campo] for i, campo in refs)
+    hallazgos = []
+    for (i, campo), v in zip(refs, valid):
+        if not v:
+            hallazgos.append({"documento": i, "campo": campo, "cuit": extracted[i][campo]})
+    return hallazgos
@@ -55,9 +55,9 @@ function Clientes(){
 function Documentos(){
   const [clientes,setClientes]=useState([]); const [clienteId,setClienteId]=useState("");
   const [tipo,setTipo]=useState("Factura");
-  const [file,setFile]=useState(null);
+  const [file,setFile]=useState(null); const [subidos,setSubidos]=useState([]);
   useEffect(()=>{ axios.get(API+"/clientes").then(r=>setClientes(r.data)) },[])
-  const subir=async(e)=>{ e.preventDefault(); const fd=new FormData(); fd.append("cliente_id", clienteId); fd.append("tipo", tipo); fd.append("file", file); await axios.post(API+"/documentos/upload", fd, {headers:{'Content-Type':'multipart/form-data'}}); alert("Subido"); }
+  const subir=async(e)=>{ e.preventDefault(); const fd=new FormData(); fd.append("cliente_id", clienteId); fd.append("tipo", tipo); fd.append("file", file); const {data}=await axios.post(API+"/documentos/upload", fd, {headers:{'Content-Type':'multipart/form-data'}}); setSubidos([data, ...subidos]); }
   return (<div>
     <h2>Subir documentos</h2>
     <form onSubmit={subir} style={{display:"grid", gap:8, maxWidth:420}}>
@@ -69,27 +69,39 @@ function Documentos(){
       <input type="file" onChange={e=>setFile(e.target.files[0])}/>
       <button disabled={!file || !clienteId}>Subir</button>
     </form>
+    {subidos.length>0 && <h3>Subidos</h3>}
+    <div style={{display:"flex", gap:10, flexWrap:"wrap"}}>
+      {subidos.map(d=>(<figure key={d.id} style={{margin:0, width:128}}>
+        <img src={`${API}/documentos/${d.id}/miniatura?size=128`} alt={d.tipo} width="128" loading="lazy" onError={e=>{e.target.style.display="none"}}/>
+        <figcaption>#{d.id} {d.tipo}</figcaption>
+      </figure>))}
+    </div>
   </div>)
 }
 
 function Previsualizacion(){
   const [clienteId,setClienteId]=useState("");
-  const [clientes,setClientes]=useState([]); const [data,setData]=useState(null);
+  const [clientes,setClientes]=useState([]); const [rows,setRows]=useState(null);
+  const [cursor,setCursor]=useState(null); const [total,setTotal]=useState(0); const [validaciones,setValidaciones]=useState(null);
   useEffect(()=>{ axios.get(API+"/clientes").then(r=>setClientes(r.data)) },[])
-  const procesar=async()=>{ const {data}=await axios.post(API+"/procesar", {cliente_id:Number(clienteId)}); setData(data.contenido_json); }
+  // asientos paginados desde el servidor: nunca se baja el paquete completo
+  const pagina=async(c)=>{ const {data}=await axios.get(`${API}/resultados/${clienteId}/preview/asientos`, {params:{limit:200, cursor:c||undefined}}); setRows(c?[...rows, ...data.items]:data.items); setCursor(data.next_cursor); setTotal(data.total); }
+  const procesar=async()=>{ const {data}=await axios.post(API+"/procesar", {cliente_id:Number(clienteId)}, {params:{incluir_contenido:false}}); setValidaciones(data.contenido_json._validaciones); pagina(null); }
   return (<div>
     <h2>Previsualización</h2>
-    <select value={clienteId} onChange={e=>setClienteId(e.target.value)}>
+    <select value={clienteId} onChange={e=>{setClienteId(e.target.value); setRows(null); setValidaciones(null)}}>
       <option value="">Seleccione cliente</option>
       {clientes.map(c=><option key={c.id} value={c.id}>{c.nombre}</option>)}
     </select>
     <button onClick={procesar} disabled={!clienteId}>Procesar</button>
-    {data && <div style={{marginTop:16}}>
-      <h3>Asientos (preview)</h3>
+    <button onClick={()=>pagina(null)} disabled={!clienteId}>Ver último resultado</button>
+    {rows && <div style={{marginTop:16}}>
+      <h3>Asientos (preview) — {rows.length} de {total}</h3>
       <table border="1" cellPadding="4"><thead><tr><th>Fecha</th><th>Cuenta</th><th>Debe</th><th>Haber</th><th>Detalle</th></tr></thead>
-        <tbody>{data.asientos.map((a,i)=><tr key={i}><td>{a.Fecha}</td><td>{a.Cuenta}</td><td>{a.Debe}</td><td>{a.Haber}</td><td>{a.Detalle||""}</td></tr>)}</tbody>
+        <tbody>{rows.map((a,i)=><tr key={i}><td>{a.Fecha}</td><td>{a.Cuenta}</td><td>{a.Debe}</td><td>{a.Haber}</td><td>{a.Detalle||""}</td></tr>)}</tbody>
       </table>
-      <p>Cuadre de sumas: {String(data._validaciones.cuadre_sumas)}</p>
+      {cursor && <button style={{marginTop:8}} onClick={()=>pagina(cursor)}>Cargar más</button>}
+      {validaciones && <p>Cuadre de sumas: {String(validaciones.cuadre_sumas)}</p>}
     </div>}
   </div>)
 }
@@ -113,13 +125,14 @@ function Resultados(){
     <button style={{marginTop:12}} onClick={descargarTodo} disabled={!clienteId}>Descargar todo (.zip)</button>
     <h3 style={{marginTop:20}}>Descargar archivos AFIP (.txt)</h3>
 <div style={{display:"flex", gap:10, flexWrap:"wrap"}}>
-  {["iva","ganancias","iibb","bbpp"].map(t=>(
+  {["iva","ganancias","iibb","bbpp","libro_iva"].map(t=>(
     <button key={t} 
       onClick={()=>window.open(`${API}/exportar_afip/${t}?cliente_id=${clienteId}`,'_blank')} 
       disabled={!clienteId}>
       {t.toUpperCase()}
     </button>
   ))}
+  <button onClick={()=>window.open(`${API}/exportar_afip_bulk`,'_blank')}>TODOS LOS CLIENTES (.zip)</button>
 </div>
 
   </div>)